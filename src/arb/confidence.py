@@ -0,0 +1,72 @@
+from __future__ import annotations
+from typing import Protocol, Dict, Type
+import numpy as np
+
+class ConfidenceModel(Protocol):
+    """
+    Scores a batch of n candidates with `legs` books each.
+      edge_bps        (n,)       net edge after fees
+      depth           (n,)       depth score in [0, 1], computed by the scanner
+      age_s           (n, legs)  quote age per leg
+      feed_interval_s (n, legs)  mean seconds between received quotes per leg (NaN if unknown)
+      vol_bps         (n, legs)  mid volatility per leg book, bps/sqrt(s) (NaN if unknown)
+    Returns confidence (n,) in [0, 1].
+    """
+    def score(self, edge_bps: np.ndarray, depth: np.ndarray, age_s: np.ndarray,
+              feed_interval_s: np.ndarray, vol_bps: np.ndarray) -> np.ndarray: ...
+
+
+class HeuristicConfidence:
+    """Fixed age cutoff + linear decay on the stalest leg, averaged with depth."""
+    def __init__(self, cutoff_s: float = 0.2, decay_s: float = 1.0):
+        self.cutoff_s = cutoff_s
+        self.decay_s = decay_s
+
+    def score(self, edge_bps, depth, age_s, feed_interval_s, vol_bps):
+        age = age_s.max(axis=1)
+        time_score = np.clip(1.0 - (age - self.cutoff_s) / self.decay_s, 0.0, 1.0)
+        return 0.5 * depth + 0.5 * time_score
+
+
+class StatsConfidence:
+    """
+    Data-driven model using per-book rolling statistics.
+      time:  each leg may be up to lag_mult of its own feed interval old before
+             decaying, so a venue that normally ticks every 50ms is marked lagging
+             long before a slow one. The tolerance is capped at cutoff_s, so slow
+             (e.g. REST-polled) venues are never judged more leniently than the
+             fixed heuristic. Unknown books fall back to cutoff_s.
+      drift: expected adverse mid move over the legs' ages (vol * sqrt(age)) versus
+             the edge; crosses smaller than the noise of a lagging book score low.
+    """
+    def __init__(self, cutoff_s: float = 0.2, decay_s: float = 1.0, lag_mult: float = 3.0,
+                 w_depth: float = 0.5, w_time: float = 0.25, w_drift: float = 0.25):
+        self.cutoff_s = cutoff_s
+        self.decay_s = decay_s
+        self.lag_mult = lag_mult
+        self.w_depth = w_depth
+        self.w_time = w_time
+        self.w_drift = w_drift
+
+    def score(self, edge_bps, depth, age_s, feed_interval_s, vol_bps):
+        allowed = np.where(np.isfinite(feed_interval_s),
+                           np.minimum(self.lag_mult * feed_interval_s, self.cutoff_s), self.cutoff_s)
+        time_score = np.clip(1.0 - (age_s - allowed) / self.decay_s, 0.0, 1.0).min(axis=1)
+
+        var = np.where(np.isfinite(vol_bps), vol_bps * vol_bps, 0.0) * np.maximum(age_s, 0.0)
+        drift_bps = np.sqrt(var.sum(axis=1))
+        drift_score = np.clip(1.0 - drift_bps / np.maximum(edge_bps, 1e-9), 0.0, 1.0)
+
+        return self.w_depth * depth + self.w_time * time_score + self.w_drift * drift_score
+
+
+MODELS: Dict[str, Type] = {
+    "heuristic": HeuristicConfidence,
+    "stats": StatsConfidence,
+}
+
+def make_model(name: str, **kw) -> ConfidenceModel:
+    try:
+        return MODELS[name](**kw)
+    except KeyError:
+        raise ValueError(f"unknown confidence model {name!r}; expected one of {sorted(MODELS)}") from None
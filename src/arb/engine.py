@@ -1,28 +1,136 @@
 from __future__ import annotations
 import asyncio, time, math
 from decimal import Decimal as D
-from typing import Dict, Tuple, Callable, List
+from typing import Dict, Tuple, Callable, List, Optional, NamedTuple
+import numpy as np
 from core.types import BestBook, Opportunity, RuntimeConfig
 from core.fees import Fees
+from core.stats import MarketStats
 from core.utils import now_s, net_bps as calc_net_bps
+from arb.confidence import ConfidenceModel, HeuristicConfidence
 
-Confidence = float
+# BookMatrix fields
+BID, BID_SZ, ASK, ASK_SZ, TS = range(5)
+
+class CexCandidate(NamedTuple):
+    pair: str
+    buy_ex: str
+    buy_price: D
+    buy_size: D
+    buy_ts: float
+    sell_ex: str
+    sell_price: D
+    sell_size: D
+    sell_ts: float
+    net_bps: D
+    qty: D
+
+class BookMatrix:
+    """
+    Dense float copy of the latest top-of-book: q[field, pair, exchange].
+    Updated in O(1) per tick; rows/columns grow by doubling as new pairs and
+    exchanges appear. Missing books have ts = -inf and so are always stale.
+    """
+    def __init__(self, fees: Fees):
+        self.fees = fees
+        self.pair_ix: Dict[str, int] = {}
+        self.ex_ix: Dict[str, int] = {}
+        self.exchanges: List[str] = []
+        self.q = self._blank(8, 4)
+        self.taker = np.zeros(4)            # taker bps per exchange column
+
+    @staticmethod
+    def _blank(n_pairs: int, n_ex: int) -> np.ndarray:
+        q = np.zeros((5, n_pairs, n_ex))
+        q[TS] = -np.inf
+        return q
+
+    def _grow(self, n_pairs: int, n_ex: int):
+        q = self._blank(n_pairs, n_ex)
+        P, E = self.q.shape[1:]
+        q[:, :P, :E] = self.q
+        self.q = q
+        if n_ex > len(self.taker):
+            self.taker = np.concatenate([self.taker, np.zeros(n_ex - len(self.taker))])
+
+    def on_book(self, b: BestBook):
+        pi = self.pair_ix.get(b.pair)
+        if pi is None:
+            pi = self.pair_ix[b.pair] = len(self.pair_ix)
+            if pi >= self.q.shape[1]:
+                self._grow(2 * self.q.shape[1], self.q.shape[2])
+        ei = self.ex_ix.get(b.exchange)
+        if ei is None:
+            ei = self.ex_ix[b.exchange] = len(self.exchanges)
+            self.exchanges.append(b.exchange)
+            if ei >= self.q.shape[2]:
+                self._grow(self.q.shape[1], 2 * self.q.shape[2])
+            self.taker[ei] = self.fees.taker_bps(b.exchange)
+        q = b.quote
+        self.q[:, pi, ei] = (float(q.bid), float(q.bid_sz), float(q.ask), float(q.ask_sz), q.ts)
 
 class Detector:
-    def __init__(self, fees: Fees, cfg: RuntimeConfig, publish_opp: Callable[[Opportunity], None]):
+    def __init__(self, fees: Fees, cfg: RuntimeConfig, publish_opp: Callable[[Opportunity], None],
+                 stats: Optional[MarketStats] = None, model: Optional[ConfidenceModel] = None):
         self.fees = fees
         self.cfg = cfg
         self.publish_opp = publish_opp
+        # stats shared with other consumers are fed by their owner (io.cli)
+        self._own_stats = stats is None
+        self.stats = stats if stats is not None else MarketStats(max_gap_s=cfg.stale_ms / 1000)
+        self.model = model if model is not None else HeuristicConfidence()
         self.last_by_ex_pair: Dict[Tuple[str,str], BestBook] = {}
+        self.matrix = BookMatrix(fees)
 
     def on_book(self, b: BestBook):
         self.last_by_ex_pair[(b.exchange, b.pair)] = b
+        self.matrix.on_book(b)
+        if self._own_stats:
+            self.stats.on_book(b)
+
+    def _candidate(self, pair: str, aex: str, aprice: D, asize: D, ats: float,
+                   bex: str, bprice: D, bsize: D, bts: float) -> Optional[CexCandidate]:
+        nbps = calc_net_bps(bprice, aprice,
+                            self.fees.taker_bps(aex), self.fees.taker_bps(bex),
+                            int(self.cfg.slippage_bps_buffer))
+        if nbps < self.cfg.min_profit_bps_after_fees:
+            return None
 
-    def _confidence(self, qty: D, bid_sz: D, ask_sz: D, age_s: float) -> Confidence:
-        depth = float(min(bid_sz, ask_sz) / (qty if qty > 0 else D("1e-9")))
-        depth_score = max(0.0, min(depth, 1.0))
-        time_score = 1.0 if age_s <= 0.2 else max(0.0, 1.0 - (age_s - 0.2))
-        return 0.5 * depth_score + 0.5 * time_score
+        # size: respect AUD cap
+        aud_cap_qty = (D(self.cfg.max_trade_aud) / aprice).quantize(D("0.00000001"))
+        qty = min(asize, bsize, aud_cap_qty)
+        if qty <= 0: return None
+
+        return CexCandidate(pair, aex, aprice, asize, ats, bex, bprice, bsize, bts, nbps, qty)
+
+    def _publish(self, now: float, cands: List[CexCandidate]):
+        # confidence is scored for all candidates in one batch
+        n = len(cands)
+        edge = np.fromiter((float(c.net_bps) for c in cands), dtype=np.float64, count=n)
+        depth = np.fromiter((float(min(c.sell_size, c.buy_size) / c.qty) for c in cands),
+                            dtype=np.float64, count=n)
+        depth = np.clip(depth, 0.0, 1.0)
+        ts = np.fromiter((t for c in cands for t in (c.buy_ts, c.sell_ts)), dtype=np.float64, count=2 * n)
+        age = np.maximum(now - ts, 0.0).reshape(n, 2)
+        feed_interval, vol = self.stats.features((ex, c.pair) for c in cands for ex in (c.buy_ex, c.sell_ex))
+        conf = self.model.score(edge, depth, age, feed_interval.reshape(n, 2), vol.reshape(n, 2))
+
+        for c, cf in zip(cands, conf):
+            if cf < self.cfg.min_confidence:
+                continue
+            # stalest leg, the same age the confidence model scores
+            age_s = max(now - min(c.buy_ts, c.sell_ts), 0.0)
+            opp = Opportunity(
+                ts=now, pair=c.pair,
+                buy_ex=c.buy_ex, sell_ex=c.sell_ex,
+                buy_price=c.buy_price, sell_price=c.sell_price, qty=c.qty,
+                raw_bps=((c.sell_price - c.buy_price) / c.buy_price) * D(10_000),
+                net_bps=c.net_bps,
+                profit_aud=(c.sell_price - c.buy_price) * c.qty,
+                confidence=float(cf),
+                latency_ms=int(age_s * 1000)
+            )
+            self.publish_opp(opp)
 
     def scan_pair(self, pair: str):
         # gather fresh
@@ -37,37 +145,58 @@ class Detector:
         if not bids or not asks: return
 
         # try every ask x bid across exchanges
+        cands = []
         for aex, aprice, asize, ats in asks:
             for bex, bprice, bsize, bts in bids:
                 if aex == bex: continue
-                nbps = calc_net_bps(bprice, aprice,
-                                    self.fees.taker_bps(aex), self.fees.taker_bps(bex),
-                                    int(self.cfg.slippage_bps_buffer))
-                if nbps < self.cfg.min_profit_bps_after_fees:
-                    continue
-
-                # size: respect AUD cap
-                aud_cap_qty = (D(self.cfg.max_trade_aud) / aprice).quantize(D("0.00000001"))
-                qty = min(asize, bsize, aud_cap_qty)
-                if qty <= 0: continue
-
-                age_s = max(now - max(ats, bts), 0.0)
-                conf = self._confidence(qty, bsize, asize, age_s)
-                if conf < self.cfg.min_confidence: 
-                    continue
-
-                opp = Opportunity(
-                    ts=now, pair=pair,
-                    buy_ex=aex, sell_ex=bex,
-                    buy_price=aprice, sell_price=bprice, qty=qty,
-                    raw_bps=((bprice - aprice) / aprice) * D(10_000),
-                    net_bps=nbps,
-                    profit_aud=(bprice - aprice) * qty,
-                    confidence=conf,
-                    latency_ms=int(age_s * 1000)
-                )
-                self.publish_opp(opp)
+                c = self._candidate(pair, aex, aprice, asize, ats, bex, bprice, bsize, bts)
+                if c is not None:
+                    cands.append(c)
+        if cands:
+            self._publish(now, cands)
+
+    def scan_batch(self, pairs: List[str]):
+        """
+        Whole-market sweep: builds the pair x buy_ex x sell_ex net-bps tensor
+        from BookMatrix in one pass (fees, staleness and AUD cap included) and
+        only rechecks the qualifying cells in Decimal before publishing.
+        """
+        m = self.matrix
+        names = [p for p in dict.fromkeys(pairs) if p in m.pair_ix]
+        rows = [m.pair_ix[p] for p in names]
+        E = len(m.exchanges)
+        if not rows or E < 2: return
+
+        now = now_s()
+        q = m.q[:, rows, :E]
+        bid, bid_sz, ask, ask_sz, ts = q[BID], q[BID_SZ], q[ASK], q[ASK_SZ], q[TS]
+        fresh = (now - ts) <= self.cfg.stale_ms / 1000
+        fee = m.taker[:E]
+
+        # axes: [pair, buy_ex (ask side), sell_ex (bid side)]
+        a = ask[:, :, None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            net = ((bid[:, None, :] - a) / a * 10_000
+                   - fee[None, :, None] - fee[None, None, :] - int(self.cfg.slippage_bps_buffer))
+            cap_qty = float(self.cfg.max_trade_aud) / a
+        qty = np.minimum(np.minimum(ask_sz[:, :, None], bid_sz[:, None, :]), cap_qty)
+        ok = (fresh[:, :, None] & fresh[:, None, :] & ~np.eye(E, dtype=bool)[None]
+              & (a > 0) & (qty > 0)
+              # small tolerance: float borderline cells are settled by the Decimal recheck
+              & (net >= float(self.cfg.min_profit_bps_after_fees) - 1e-6))
+        if not ok.any(): return
+
+        cands = []
+        for pi, ai, bi in zip(*np.nonzero(ok)):
+            pair = names[pi]
+            aex, bex = m.exchanges[ai], m.exchanges[bi]
+            aq = self.last_by_ex_pair[(aex, pair)].quote
+            bq = self.last_by_ex_pair[(bex, pair)].quote
+            c = self._candidate(pair, aex, aq.ask, aq.ask_sz, aq.ts, bex, bq.bid, bq.bid_sz, bq.ts)
+            if c is not None:
+                cands.append(c)
+        if cands:
+            self._publish(now, cands)
 
     def full_scan(self, pairs: List[str]):
-        for p in pairs:
-            self.scan_pair(p)
+        self.scan_batch(pairs)
@@ -1,9 +1,21 @@
 from __future__ import annotations
 from decimal import Decimal as D
-from typing import Dict, Tuple, List, Callable, Optional
+from typing import Dict, Tuple, List, Callable, Optional, NamedTuple
+import numpy as np
 from core.types import BestBook, TriOpportunity, RuntimeConfig
 from core.fees import Fees
+from core.stats import MarketStats
 from core.utils import now_s
+from arb.confidence import ConfidenceModel, HeuristicConfidence
+
+class TriCandidate(NamedTuple):
+    x: str                          # path AUD -> x -> y -> AUD
+    y: str
+    legs: Tuple[dict, dict, dict]   # edges from _edges_for_exchange
+    end: D
+    net_bps: D
+    latency_ms: int
+    ratios: Tuple[float, float, float]  # amount in / max_in per leg
 
 class TriDetector:
     """
@@ -13,15 +25,22 @@ class TriDetector:
       QUOTE -> BASE : buy BASE with QUOTE at ask (rate = (1-fee-slip)/ask, max_in = ask_sz*ask)
       BASE -> QUOTE : sell BASE for QUOTE at bid (rate = (1-fee-slip)*bid, max_in = bid_sz)
     """
-    def __init__(self, fees: Fees, cfg: RuntimeConfig, publish_tri: Callable[[TriOpportunity], None]):
+    def __init__(self, fees: Fees, cfg: RuntimeConfig, publish_tri: Callable[[TriOpportunity], None],
+                 stats: Optional[MarketStats] = None, model: Optional[ConfidenceModel] = None):
         self.fees = fees
         self.cfg = cfg
         self.publish_tri = publish_tri
+        # stats shared with other consumers are fed by their owner (io.cli)
+        self._own_stats = stats is None
+        self.stats = stats if stats is not None else MarketStats(max_gap_s=cfg.stale_ms / 1000)
+        self.model = model if model is not None else HeuristicConfidence(decay_s=0.8)
         # latest quotes per (exchange, pair)
         self.last: Dict[Tuple[str,str], BestBook] = {}
 
     def on_book(self, b: BestBook):
         self.last[(b.exchange, b.pair)] = b
+        if self._own_stats:
+            self.stats.on_book(b)
 
     def _edges_for_exchange(self, ex: str, stale_s: float):
         now = now_s()
@@ -74,7 +93,8 @@ class TriDetector:
             return
 
         now = now_s()
-        # enumerate triangles: AUD -> X -> Y -> AUD
+        # enumerate triangles: AUD -> X -> Y -> AUD; confidence is scored in one batch
+        cands = []
         for X in currencies:
             if X == "AUD": continue
             e1 = edges.get(("AUD", X))
@@ -104,31 +124,40 @@ class TriDetector:
                 if net_bps < self.cfg.min_profit_bps_after_fees:
                     continue
 
-                # confidence: depth usage + timeliness
-                def depth_score(ai, edge):
-                    # if we used less than 50% of max_in, good (1.0); else degrade
-                    ratio = float((ai / D(edge["max_in"])) if D(edge["max_in"]) > 0 else 0)
-                    return 1.0 if ratio <= 0.5 else max(0.0, 1.0 - (ratio - 0.5) * 2.0)
-
-                conf_depth = (depth_score(start, e1) + depth_score(amount1, e2) + depth_score(amount2, e3)) / 3.0
-                conf_time = 1.0 if latency_ms <= 200 else max(0.0, 1.0 - (latency_ms - 200) / 800.0)
-                confidence = 0.5 * conf_depth + 0.5 * conf_time
+                # depth usage ratio per leg (amount in / max_in)
+                ratios = tuple(float(ai / D(e["max_in"])) if D(e["max_in"]) > 0 else 0.0
+                               for ai, e in ((start, e1), (amount1, e2), (amount2, e3)))
+                cands.append(TriCandidate(X, Y, (e1, e2, e3), end, net_bps, latency_ms, ratios))
+        if not cands:
+            return
 
-                if confidence < self.cfg.min_confidence:
-                    continue
+        n = len(cands)
+        legs = [e for c in cands for e in c.legs]
+        edge = np.fromiter((float(c.net_bps) for c in cands), dtype=np.float64, count=n)
+        # if we used less than 50% of max_in, good (1.0); else degrade
+        ratio = np.array([c.ratios for c in cands], dtype=np.float64)
+        depth = np.clip(1.0 - (ratio - 0.5) * 2.0, 0.0, 1.0).mean(axis=1)
+        age = np.fromiter((e["age_s"] for e in legs), dtype=np.float64, count=3 * n).reshape(n, 3)
+        feed_interval, vol = self.stats.features((ex, e["pair"]) for e in legs)
+        conf = self.model.score(edge, depth, age, feed_interval.reshape(n, 3), vol.reshape(n, 3))
+
+        for c, confidence in zip(cands, conf):
+            if confidence < self.cfg.min_confidence:
+                continue
 
-                tri = TriOpportunity(
-                    ts=now, exchange=ex, path=["AUD", X, Y, "AUD"],
-                    start_aud=start, end_aud=end,
-                    net_bps=net_bps, profit_aud=(end - start),
-                    confidence=confidence, latency_ms=latency_ms,
-                    legs=[
-                        {"pair": e1["pair"], "side": e1["side"], "price": str(e1["price"]),
-                         "max_in": str(e1["max_in"]), "age_s": round(e1["age_s"], 3)},
-                        {"pair": e2["pair"], "side": e2["side"], "price": str(e2["price"]),
-                         "max_in": str(e2["max_in"]), "age_s": round(e2["age_s"], 3)},
-                        {"pair": e3["pair"], "side": e3["side"], "price": str(e3["price"]),
-                         "max_in": str(e3["max_in"]), "age_s": round(e3["age_s"], 3)},
-                    ]
-                )
-                self.publish_tri(tri)
+            e1, e2, e3 = c.legs
+            tri = TriOpportunity(
+                ts=now, exchange=ex, path=["AUD", c.x, c.y, "AUD"],
+                start_aud=start, end_aud=c.end,
+                net_bps=c.net_bps, profit_aud=(c.end - start),
+                confidence=float(confidence), latency_ms=c.latency_ms,
+                legs=[
+                    {"pair": e1["pair"], "side": e1["side"], "price": str(e1["price"]),
+                     "max_in": str(e1["max_in"]), "age_s": round(e1["age_s"], 3)},
+                    {"pair": e2["pair"], "side": e2["side"], "price": str(e2["price"]),
+                     "max_in": str(e2["max_in"]), "age_s": round(e2["age_s"], 3)},
+                    {"pair": e3["pair"], "side": e3["side"], "price": str(e3["price"]),
+                     "max_in": str(e3["max_in"]), "age_s": round(e3["age_s"], 3)},
+                ]
+            )
+            self.publish_tri(tri)
@@ -0,0 +1,116 @@
+from __future__ import annotations
+import math
+from typing import Dict, Tuple, Iterable
+import numpy as np
+from core.types import BestBook
+
+# ring columns
+DT, RET = range(2)
+
+class BookStats:
+    """
+    Fixed-size ring of recent quotes for one (exchange, pair). Each row is
+    dt (seconds since the previous quote) and ret (log return of mid).
+    Quotes are stamped with our local receive time (md.ws_client /
+    md.rest_client), so dt measures the feed cadence: the REST poll or WS
+    push interval, not how often the venue's book actually changes.
+    Running sums keep push() and every statistic O(1); they are rebuilt from
+    the ring each time it wraps so float drift cannot accumulate.
+    Gaps longer than max_gap_s (reconnects, outages) never enter the ring; the
+    sample only re-seeds the previous ts/mid.
+    """
+    __slots__ = ("cap", "max_gap_s", "buf", "n", "i", "last_ts", "last_mid", "s_dt", "s_r2")
+
+    def __init__(self, capacity: int = 256, max_gap_s: float = 1.0):
+        self.cap = max(int(capacity), 2)
+        self.max_gap_s = max_gap_s
+        self.buf = np.zeros((self.cap, 2), dtype=np.float64)
+        self.n = 0
+        self.i = 0
+        self.last_ts = 0.0
+        self.last_mid = 0.0
+        self.s_dt = self.s_r2 = 0.0
+
+    def push(self, ts: float, bid: float, ask: float) -> bool:
+        if bid <= 0 or ask <= 0:
+            return False
+        if ts <= self.last_ts:
+            return False  # duplicate or out-of-order local receive stamp
+        mid = 0.5 * (bid + ask)
+        prev_ts, prev_mid = self.last_ts, self.last_mid
+        self.last_ts, self.last_mid = ts, mid
+        if prev_mid <= 0:
+            return False  # first sample only seeds dt/ret
+
+        dt = ts - prev_ts
+        if dt > self.max_gap_s:
+            return False  # gap, not cadence: re-seeded above
+        ret = math.log(mid / prev_mid)
+
+        row = self.buf[self.i]
+        if self.n == self.cap:
+            self.s_dt -= row[DT]
+            self.s_r2 -= row[RET] * row[RET]
+        row[DT], row[RET] = dt, ret
+        self.s_dt += dt
+        self.s_r2 += ret * ret
+
+        self.i = (self.i + 1) % self.cap
+        if self.n < self.cap:
+            self.n += 1
+        if self.i == 0:
+            self._resync()
+        return True
+
+    def _resync(self):
+        b = self.buf[:self.n]
+        self.s_dt = float(b[:, DT].sum())
+        self.s_r2 = float((b[:, RET] ** 2).sum())
+
+    @property
+    def feed_interval_s(self) -> float:
+        """Mean seconds between received quotes (NaN until two quotes seen)."""
+        return self.s_dt / self.n if self.n else math.nan
+
+    @property
+    def vol_bps(self) -> float:
+        """Realized mid volatility in bps per sqrt(second)."""
+        return math.sqrt(max(self.s_r2, 0.0) / self.s_dt) * 10_000 if self.s_dt > 0 else math.nan
+
+
+class MarketStats:
+    """
+    BookStats per (exchange, pair), plus dense per-book arrays of the derived
+    statistics so scanners can gather features for many candidates at once.
+    Slot 0 is a sentinel holding NaN for books we have not seen yet.
+    """
+    def __init__(self, capacity: int = 256, max_gap_s: float = 1.0):
+        self.capacity = capacity
+        self.max_gap_s = max_gap_s
+        self.books: Dict[Tuple[str,str], BookStats] = {}
+        self._slot: Dict[Tuple[str,str], int] = {}
+        self.feed_interval_s = np.full(16, np.nan)
+        self.vol_bps = np.full(16, np.nan)
+
+    def slot(self, ex: str, pair: str) -> int:
+        return self._slot.get((ex, pair), 0)
+
+    def on_book(self, b: BestBook):
+        key = (b.exchange, b.pair)
+        st = self.books.get(key)
+        if st is None:
+            st = self.books[key] = BookStats(self.capacity, self.max_gap_s)
+            self._slot[key] = len(self._slot) + 1
+            if len(self._slot) >= len(self.feed_interval_s):
+                self.feed_interval_s = np.concatenate([self.feed_interval_s, np.full(len(self.feed_interval_s), np.nan)])
+                self.vol_bps = np.concatenate([self.vol_bps, np.full(len(self.vol_bps), np.nan)])
+        q = b.quote
+        if st.push(q.ts, float(q.bid), float(q.ask)):
+            s = self._slot[key]
+            self.feed_interval_s[s] = st.feed_interval_s
+            self.vol_bps[s] = st.vol_bps
+
+    def features(self, keys: Iterable[Tuple[str,str]]) -> tuple[np.ndarray, np.ndarray]:
+        """(feed_interval_s, vol_bps) for each (exchange, pair) key, NaN where unknown."""
+        idx = np.fromiter((self._slot.get(k, 0) for k in keys), dtype=np.intp)
+        return self.feed_interval_s[idx], self.vol_bps[idx]
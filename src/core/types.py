@@ -56,3 +56,5 @@ class RuntimeConfig(BaseModel):
     dashboard_host: str
     dashboard_port: int
     tri_start_aud: Number
+    confidence_model: str = "heuristic"   # see arb.confidence.MODELS
+    stats_window: int = 256               # samples kept per (exchange, pair)
@@ -4,6 +4,7 @@ from pathlib import Path
 from decimal import Decimal as D
 from core.types import RuntimeConfig, BestBook, Opportunity, TriOpportunity
 from core.fees import Fees
+from core.stats import MarketStats
 from core.utils import now_s
 from md.aggregator import Aggregator
 from md.ws_client import run_ws_exchange
@@ -11,6 +12,7 @@ from md.rest_client import run_rest_exchange
 from src.io.csv_sink import CsvSink
 from arb.engine import Detector
 from arb.triangular import TriDetector
+from arb.confidence import make_model
 from src.io.dashboard_api import make_app
 import uvicorn
 
@@ -68,12 +70,16 @@ async def run():
         broadcast(t.model_dump())
 
     # --- detectors ---
-    cex_detector = Detector(fees, cfg, publish_cex)
-    tri_detector = TriDetector(fees, cfg, publish_tri)
+    stats = MarketStats(cfg.stats_window, cfg.stale_ms / 1000)
+    cex_detector = Detector(fees, cfg, publish_cex, stats=stats,
+                            model=make_model(cfg.confidence_model))
+    tri_detector = TriDetector(fees, cfg, publish_tri, stats=stats,
+                               model=make_model(cfg.confidence_model, decay_s=0.8))
 
     # write all top-of-book snapshots + feed detectors
     def on_book(b: BestBook):
         sink.write_tob(b)
+        stats.on_book(b)
         cex_detector.on_book(b)
         tri_detector.on_book(b)
         # fast per-pair CEX scan